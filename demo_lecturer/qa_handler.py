@@ -6,9 +6,18 @@ Uses Ollama (FREE local LLM) - No API costs!
 Integrates with the existing lecture_generator.py and TTS pipeline.
 """
 
+import asyncio
+import concurrent.futures
+import difflib
+import hashlib
 import json
 import requests
 import os
+import queue
+import re
+import shutil
+import threading
+import time
 from pathlib import Path
 from typing import Optional, Tuple
 import logging
@@ -21,24 +30,172 @@ except ImportError:
     TTS_AVAILABLE = False
     print("Warning: TTS not available. Audio responses will be disabled.")
 
+try:
+    import aiohttp  # async Ollama client; blocking fallback if missing
+except ImportError:
+    aiohttp = None
+
+try:
+    import orjson  # ~5x faster JSON encode/decode; optional
+except ImportError:
+    orjson = None
+
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+_SENT_END = re.compile(r'(?<=[.!?])\s+')
+# Trailing quantization tag (e.g. "-q4_K_M") for tolerant model matching
+_QUANT_SUFFIX = re.compile(r'-q\d\w*$', re.IGNORECASE)
+
+# Decode speed is memory-bandwidth-bound, so a Q4_K_M build (~half the
+# weight bytes of the default pull) roughly doubles tokens/sec; "fast"
+# trades answer depth for an even lower latency floor.
+MODEL_PROFILES = {
+    "fast": "phi3:mini-q4_K_M",
+    "balanced": "llama3.2:3b-instruct-q4_K_M",
+}
+DEFAULT_MODEL = MODEL_PROFILES.get(
+    os.environ.get("QA_MODEL_PROFILE", "balanced"), MODEL_PROFILES["balanced"]
+)
+
+SYSTEM_PROMPT = """You are an AI teacher giving a lecture. A student has asked a question.
+
+Instructions:
+- Provide a clear, concise answer based on the lecture content
+- If the question relates to the lecture material, reference specific slides when helpful
+- If the question is outside the lecture scope, politely acknowledge that and provide a brief, helpful response
+- Keep answers to 2-3 sentences for natural spoken delivery
+- Be friendly and encouraging"""
+
+
+class AsyncOllamaClient:
+    """Funnels Ollama calls through one background event loop.
+
+    Flask threads block on a Future while the actual HTTP happens over a
+    single keep-alive aiohttp session. Requests landing within a short
+    window are drained into one gather() batch, so N concurrent student
+    questions reach Ollama together and share its server-side parallelism
+    (OLLAMA_NUM_PARALLEL) instead of serializing one round-trip each.
+    """
+
+    MAX_BATCH = 8
+    BATCH_WINDOW = 0.01  # seconds to wait for more questions to coalesce
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._loop = asyncio.new_event_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._session = None
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.create_task(self._consume())
+        self._loop.run_forever()
+
+    async def _consume(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=16, keepalive_timeout=300)
+        )
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.BATCH_WINDOW
+            while len(batch) < self.MAX_BATCH:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Fire the whole batch without blocking the next drain cycle
+            self._loop.create_task(
+                asyncio.gather(*(self._post(*item) for item in batch))
+            )
+
+    async def _post(self, path, payload, timeout, fut):
+        try:
+            # Payloads arrive either as dicts or as pre-serialized bytes
+            # (the orjson template path)
+            if isinstance(payload, (bytes, bytearray)):
+                kwargs = {"data": payload, "headers": {"Content-Type": "application/json"}}
+            else:
+                kwargs = {"json": payload}
+            async with self._session.post(
+                f"{self.base_url}{path}",
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                **kwargs,
+            ) as resp:
+                fut.set_result((resp.status, await resp.json()))
+        except Exception as exc:
+            fut.set_exception(exc)
+
+    def post(self, path: str, payload: dict, timeout: float = 60):
+        """Blocking submit from a worker thread; returns (status, json)."""
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (path, payload, timeout, fut))
+        return fut.result(timeout + 5)
+
 
 class LectureQAHandler:
     """Handles question answering during lectures using free local Ollama LLM"""
     
-    def __init__(self, model_name: str = "llama3.2:3b", ollama_url: str = "http://localhost:11434"):
+    def __init__(self, model_name: str = DEFAULT_MODEL, ollama_url: str = "http://localhost:11434"):
         """
         Initialize the Q&A handler with Ollama
-        
+
         Args:
-            model_name: Ollama model to use (default: llama3.2:3b)
-                       Options: llama3.2:3b, mistral:7b, phi3:mini
+            model_name: Ollama model to use (default: the QA_MODEL_PROFILE
+                       env profile, normally llama3.2:3b-instruct-q4_K_M)
+                       Options: any Ollama model, e.g. mistral:7b, phi3:mini
             ollama_url: Ollama server URL (default: localhost:11434)
         """
         self.model_name = model_name
         self.ollama_url = ollama_url
         self.tts = None
         self.lecture_context = None
+        # Byte-identical system message across requests lets Ollama's
+        # prefix KV-cache skip re-prefilling the lecture context per call
+        self._chat_system = SYSTEM_PROMPT
         self.config = self._load_config()
+        # With aiohttp installed, concurrent questions share one keep-alive
+        # connection and coalesce into server-side batches.
+        self._ollama = AsyncOllamaClient(ollama_url) if aiohttp is not None else None
+        # Keep-alive session for the blocking paths (probe, warmup, generate
+        # fallback): reuses the TCP connection to Ollama instead of paying a
+        # handshake + pool setup per call.
+        self._session = requests.Session()
+        self._session.mount(
+            'http://', requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=32)
+        )
+        # Content-hash answer cache: a repeated question (class-wide FAQs)
+        # returns in microseconds instead of re-running a multi-second
+        # forward pass; generate_spoken_answer caches WAVs the same way.
+        self._answer_cache = {}
+        self._answer_cache_max = 256
+        # Guards the LRU pop/re-insert pair under threaded WSGI workers
+        self._cache_lock = threading.Lock()
+        # Prefetched-FAQ index: normalized question -> answer-cache key,
+        # used for fuzzy matching real student questions against it
+        self._faq_index = {}
+        # Pre-serialized /api/chat payload (orjson only): the multi-KB
+        # system prefix is encoded once per lecture, and each call just
+        # splices the serialized user turn over a placeholder.
+        self._chat_tmpl = None
+        self._rebuild_chat_template()
+        self._context_hash = "0"
+        # Health probe result is reused for a short TTL so the hot path
+        # doesn't pay an extra /api/tags round-trip per question.
+        self._status_ttl = 30.0
+        self._status_cache = None
+        # Persistent TTS worker: one daemon thread owns the model (Coqui TTS
+        # is not reentrant), loads it once on first use and stays warm, so
+        # concurrent requests queue up instead of racing or re-loading.
+        self._tts_queue = None
+        if TTS_AVAILABLE:
+            self._tts_queue = queue.Queue(maxsize=64)
+            threading.Thread(target=self._tts_worker, daemon=True).start()
         self._setup_logging()
         
     def _load_config(self) -> dict:
@@ -66,21 +223,47 @@ class LectureQAHandler:
         self.logger = logging.getLogger(__name__)
         
     def check_ollama_status(self) -> Tuple[bool, str]:
-        """Check if Ollama is running and the model is available"""
+        """Check if Ollama is running and the model is available (cached
+        for a short TTL; invalidated when a generate call fails)"""
+        now = time.monotonic()
+        if self._status_cache is not None and now - self._status_cache[0] < self._status_ttl:
+            return self._status_cache[1], self._status_cache[2]
+        ok, msg = self._probe_ollama()
+        self._status_cache = (now, ok, msg)
+        return ok, msg
+
+    def _probe_ollama(self) -> Tuple[bool, str]:
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
+            response = self._session.get(f"{self.ollama_url}/api/tags", timeout=5)
             if response.status_code == 200:
                 models = response.json().get('models', [])
-                model_names = [m['name'] for m in models]
-                
-                # Check for exact match or base model match
-                model_base = self.model_name.split(':')[0]
-                available_bases = [m.split(':')[0] for m in model_names]
-                
-                if self.model_name in model_names or model_base in available_bases:
+                model_names = {m['name'] for m in models}
+
+                # Resolve to a name that is actually installed: exact match
+                # first, then a quantization-tagged variant, then any tag of
+                # the same base model. Merely matching while still requesting
+                # the missing name would report healthy and then 404.
+                def _first(pred):
+                    return next((m for m in sorted(model_names) if pred(m)), None)
+
+                resolved = self.model_name if self.model_name in model_names else None
+                if resolved is None:
+                    wanted = _QUANT_SUFFIX.sub('', self.model_name)
+                    resolved = _first(lambda m: _QUANT_SUFFIX.sub('', m) == wanted)
+                if resolved is None:
+                    base = self.model_name.split(':')[0]
+                    resolved = _first(lambda m: m.split(':')[0] == base)
+
+                if resolved is not None:
+                    if resolved != self.model_name:
+                        self.logger.info(
+                            f"Model {self.model_name} not installed; using {resolved}"
+                        )
+                        self.model_name = resolved
+                        self._rebuild_chat_template()
                     return True, f"✅ Ollama running with model {self.model_name}"
                 else:
-                    available = ', '.join(model_names[:5]) if model_names else 'none'
+                    available = ', '.join(sorted(model_names)[:5]) if model_names else 'none'
                     return False, f"❌ Model {self.model_name} not found. Available: {available}. Run: ollama pull {self.model_name}"
             return False, "❌ Ollama responded but with an error"
         except requests.exceptions.ConnectionError:
@@ -88,26 +271,162 @@ class LectureQAHandler:
         except Exception as e:
             return False, f"❌ Error checking Ollama: {str(e)}"
     
+    def warmup(self) -> bool:
+        """Pull the model into VRAM with a 1-token generate so the first
+        student question doesn't pay the multi-second load; keep_alive=-1
+        pins it there."""
+        try:
+            response = self._session.post(
+                f"{self.ollama_url}/api/generate",
+                json={
+                    "model": self.model_name,
+                    "prompt": "ok",
+                    "stream": False,
+                    "keep_alive": -1,
+                    "options": {"num_predict": 1},
+                },
+                timeout=120,
+            )
+            ok = response.status_code == 200
+            self.logger.info("Model warmup " + ("complete" if ok else f"failed ({response.status_code})"))
+            return ok
+        except Exception as e:
+            self.logger.warning(f"Model warmup skipped: {e}")
+            return False
+
     def load_lecture_context(self, lecture_json_path: str) -> str:
         """Load lecture content for context-aware answers"""
         try:
-            with open(lecture_json_path, 'r') as f:
-                data = json.load(f)
-            
-            # Build context from all slides
-            context = "Lecture content:\n"
-            for i, slide in enumerate(data['slides'], 1):
-                narration = slide.get('narration_text', slide.get('slide_text', ''))
-                context += f"\nSlide {i}: {narration}\n"
+            with open(lecture_json_path, 'rb') as f:
+                data = _loads(f.read())
             
+            # Build context from all slides (single join, not += per slide)
+            parts = ["Lecture content:\n"]
+            parts.extend(
+                f"\nSlide {i}: {slide.get('narration_text', slide.get('slide_text', ''))}\n"
+                for i, slide in enumerate(data['slides'], 1)
+            )
+            context = ''.join(parts)
+
             self.lecture_context = context
+            self._chat_system = SYSTEM_PROMPT + "\n\n" + context
+            self._rebuild_chat_template()
+            # Hashed once here so per-question cache keys don't re-hash the
+            # multi-KB context; also invalidates the cache across lectures.
+            self._context_hash = hashlib.sha256(context.encode()).hexdigest()[:16]
             self.logger.info(f"Loaded lecture context from {lecture_json_path}")
+            if self.config.get('prefetch_faqs', True):
+                threading.Thread(target=self._prefetch_faqs, daemon=True).start()
             return context
             
         except Exception as e:
             self.logger.error(f"Failed to load lecture context: {e}")
             return ""
     
+    def _prefetch_faqs(self, num_questions: int = 10, voice_top_k: int = 3):
+        """Background startup task: ask the model which questions students
+        are likely to ask, then answer them through the normal cache-miss
+        path (and voice the top few), so the compute happens at idle time
+        instead of on a student's critical path."""
+        try:
+            status_ok, _ = self.check_ollama_status()
+            if not status_ok:
+                return
+
+            prompt = (
+                f"Based on the lecture content, list the {num_questions} questions "
+                "students are most likely to ask. Respond with only a JSON array "
+                'of objects like [{"slide": 1, "question": "..."}].'
+            )
+            response = self._session.post(
+                f"{self.ollama_url}/api/chat",
+                json={
+                    "model": self.model_name,
+                    "messages": self._build_chat_messages(prompt, None),
+                    "stream": False,
+                    "keep_alive": "24h",
+                    "options": {"temperature": 0.3, "num_predict": 512, "num_ctx": 4096},
+                },
+                timeout=120,
+            )
+            if response.status_code != 200:
+                return
+            content = _loads(response.content).get('message', {}).get('content', '')
+            start, end = content.find('['), content.rfind(']')
+            if start == -1 or end <= start:
+                return
+            faqs = _loads(content[start:end + 1])
+
+            prefetch_dir = os.path.join(self.config.get("temp_dir", "temp"), "qa_prefetch.wav")
+            for rank, item in enumerate(faqs[:num_questions]):
+                question = (item.get('question') or '').strip()
+                if not question:
+                    continue
+                slide = item.get('slide')
+                answer = self.answer_question(question, slide)
+                if answer.startswith("Error"):
+                    continue
+                cache_key = hashlib.sha256(
+                    f"{self.model_name}|{self._context_hash}|{slide}|{question.strip().lower()}".encode()
+                ).hexdigest()
+                self._faq_index[question.lower()] = cache_key
+                if rank < voice_top_k:
+                    # Populates the content-hash WAV cache; the scratch
+                    # path keeps qa_response.wav untouched for live answers
+                    self.generate_spoken_answer(answer, output_path=prefetch_dir)
+            self.logger.info(f"Prefetched {len(self._faq_index)} FAQ answers")
+        except Exception as e:
+            self.logger.warning(f"FAQ prefetch skipped: {e}")
+
+    def _fuzzy_faq_answer(self, question: str) -> Optional[str]:
+        """Serve a near-duplicate of a prefetched FAQ from cache."""
+        if not self._faq_index:
+            return None
+        match = difflib.get_close_matches(
+            question.strip().lower(), list(self._faq_index), n=1, cutoff=0.9
+        )
+        if not match:
+            return None
+        with self._cache_lock:
+            return self._answer_cache.get(self._faq_index[match[0]])
+
+    _USER_PLACEHOLDER = "\x00USER\x00"
+
+    def _user_turn(self, question: str, current_slide: Optional[int]) -> str:
+        if current_slide:
+            return f"The student is currently on slide {current_slide}. {question}"
+        return question
+
+    def _build_chat_messages(self, question: str, current_slide: Optional[int]) -> list:
+        """Chat messages with the lecture context in the (fixed) system
+        message and only the short per-question part in the user turn, so
+        the multi-KB prefill is shared across requests."""
+        return [
+            {"role": "system", "content": self._chat_system},
+            {"role": "user", "content": self._user_turn(question, current_slide)},
+        ]
+
+    def _rebuild_chat_template(self):
+        """Serialize the blocking /api/chat payload once per lecture with a
+        placeholder user turn; answer_question swaps in the real question at
+        the byte level, skipping re-encoding the system prefix per call."""
+        if orjson is None:
+            self._chat_tmpl = None
+            return
+        self._chat_tmpl = orjson.dumps({
+            "model": self.model_name,
+            "messages": self._build_chat_messages(self._USER_PLACEHOLDER, None),
+            "stream": False,
+            "keep_alive": "24h",
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "num_predict": 128,
+                "num_ctx": 4096
+            }
+        })
+        self._placeholder_bytes = orjson.dumps(self._USER_PLACEHOLDER)
+
     def answer_question(self, question: str, current_slide: Optional[int] = None) -> str:
         """
         Generate answer to student question using Ollama
@@ -119,65 +438,217 @@ class LectureQAHandler:
         Returns:
             str: The AI teacher's answer
         """
+        cache_key = hashlib.sha256(
+            f"{self.model_name}|{self._context_hash}|{current_slide}|{question.strip().lower()}".encode()
+        ).hexdigest()
+        with self._cache_lock:
+            cached = self._answer_cache.get(cache_key)
+            if cached is not None:
+                # Re-insert so frequently asked questions stay resident
+                self._answer_cache.pop(cache_key)
+                self._answer_cache[cache_key] = cached
+                return cached
+
+        fuzzy = self._fuzzy_faq_answer(question)
+        if fuzzy is not None:
+            return fuzzy
+
         # Check Ollama status first
         status_ok, status_msg = self.check_ollama_status()
         if not status_ok:
             return f"Error: {status_msg}"
-        
-        # Build prompt with lecture context
-        system_prompt = """You are an AI teacher giving a lecture. A student has asked a question.
 
-Instructions:
-- Provide a clear, concise answer based on the lecture content
-- If the question relates to the lecture material, reference specific slides when helpful
-- If the question is outside the lecture scope, politely acknowledge that and provide a brief, helpful response
-- Keep answers to 2-3 sentences for natural spoken delivery
-- Be friendly and encouraging"""
-
-        lecture_info = self.lecture_context if self.lecture_context else "No lecture content loaded."
-        slide_info = f"The student is currently on slide {current_slide}." if current_slide else ""
-
-        user_prompt = f"""{lecture_info}
-
-{slide_info}
-
-Student question: {question}
-
-Please provide a helpful answer:"""
+        if self._chat_tmpl is not None:
+            # Byte-level splice into the pre-serialized template
+            payload = self._chat_tmpl.replace(
+                self._placeholder_bytes,
+                orjson.dumps(self._user_turn(question, current_slide)),
+            )
+        else:
+            payload = {
+                "model": self.model_name,
+                "messages": self._build_chat_messages(question, current_slide),
+                "stream": False,
+                "keep_alive": "24h",  # don't evict the model between idle periods
+                "options": {
+                    "temperature": 0.7,
+                    "top_p": 0.9,
+                    "num_predict": 128,  # Cap response length (tail latency + TTS)
+                    "num_ctx": 4096  # room for the full lecture context prefix
+                }
+            }
 
         try:
             self.logger.info(f"Generating answer for: {question[:50]}...")
-            
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.model_name,
-                    "prompt": user_prompt,
-                    "system": system_prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,
-                        "top_p": 0.9,
-                        "num_predict": 256  # Limit response length for TTS
-                    }
-                },
-                timeout=60  # Local models can take a moment on first load
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                answer = result.get('response', 'No response generated')
+
+            # Local models can take a moment on first load, hence timeout=60
+            if self._ollama is not None:
+                status_code, result = self._ollama.post("/api/chat", payload, timeout=60)
+            else:
+                if isinstance(payload, bytes):
+                    response = self._session.post(
+                        f"{self.ollama_url}/api/chat", data=payload,
+                        headers={'Content-Type': 'application/json'}, timeout=60
+                    )
+                else:
+                    response = self._session.post(
+                        f"{self.ollama_url}/api/chat", json=payload, timeout=60
+                    )
+                status_code = response.status_code
+                result = _loads(response.content) if status_code == 200 else None
+
+            if status_code == 200:
+                answer = result.get('message', {}).get('content', 'No response generated').strip()
                 self.logger.info(f"Generated answer: {answer[:50]}...")
-                return answer.strip()
+                with self._cache_lock:
+                    if len(self._answer_cache) >= self._answer_cache_max:
+                        self._answer_cache.pop(next(iter(self._answer_cache)))
+                    self._answer_cache[cache_key] = answer
+                return answer
             else:
-                return f"Error: Ollama returned status {response.status_code}"
-                
-        except requests.exceptions.Timeout:
+                return f"Error: Ollama returned status {status_code}"
+
+        except (requests.exceptions.Timeout, TimeoutError):
             return "Error: Request timed out. The model may be loading for the first time. Please try again."
         except Exception as e:
+            # Force the next request to re-probe rather than trusting a
+            # cached "healthy" status from before the failure.
+            self._status_cache = None
             self.logger.error(f"Error generating answer: {e}")
             return f"Error generating answer: {str(e)}"
     
+    def answer_question_stream(self, question: str, current_slide: Optional[int] = None):
+        """Yield answer text chunks as Ollama decodes them (stream=True),
+        instead of waiting for the full generation."""
+        status_ok, status_msg = self.check_ollama_status()
+        if not status_ok:
+            yield f"Error: {status_msg}"
+            return
+
+        payload = {
+            "model": self.model_name,
+            "messages": self._build_chat_messages(question, current_slide),
+            "stream": True,
+            "keep_alive": "24h",
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "num_predict": 128,
+                "num_ctx": 4096
+            }
+        }
+
+        try:
+            with self._session.post(
+                f"{self.ollama_url}/api/chat", json=payload, stream=True, timeout=60
+            ) as response:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = _loads(line)
+                    piece = chunk.get('message', {}).get('content', '')
+                    if piece:
+                        yield piece
+                    if chunk.get('done'):
+                        break
+        except Exception as e:
+            self._status_cache = None
+            self.logger.error(f"Error streaming answer: {e}")
+            yield f"Error generating answer: {str(e)}"
+
+    def ask_and_respond_stream(self, question: str, current_slide: Optional[int] = None,
+                               generate_audio: bool = True):
+        """Stream answer text while completed sentences are synthesized in
+        the background: time-to-first-text drops to one token, and the
+        audio lands at roughly max(generate, synthesize) instead of their
+        sum. Yields text chunks; the concatenated WAV is published to the
+        usual qa_response.wav when the stream finishes."""
+        do_audio = generate_audio and TTS_AVAILABLE
+        futures = []
+        temp_dir = self.config.get("temp_dir", "temp")
+
+        def _queue_sentence(sentence: str):
+            path = os.path.join(temp_dir, f"qa_sentence_{len(futures)}.wav")
+            futures.append(self._submit_tts(sentence, path))
+
+        pending = ""
+        try:
+            for piece in self.answer_question_stream(question, current_slide):
+                yield piece
+                if not do_audio:
+                    continue
+                pending += piece
+                parts = _SENT_END.split(pending)
+                for sentence in parts[:-1]:
+                    if sentence.strip():
+                        _queue_sentence(sentence.strip())
+                pending = parts[-1]
+        finally:
+            if do_audio:
+                if pending.strip():
+                    _queue_sentence(pending.strip())
+                try:
+                    paths = [f.result(timeout=120) for f in futures]
+                    if paths:
+                        import numpy as np
+                        import soundfile as sf
+
+                        data, sample_rate = [], None
+                        for p in paths:
+                            d, sample_rate = sf.read(p)
+                            data.append(d)
+                        out = os.path.join(temp_dir, "qa_response.wav")
+                        sf.write(out, np.concatenate(data), sample_rate)
+                except Exception as e:
+                    self.logger.error(f"Failed to assemble streamed audio: {e}")
+
+    def _tts_worker(self):
+        """Daemon loop: drain up to 8 queued synthesis jobs (waiting 20 ms
+        for stragglers to coalesce) and run them back to back on the warm
+        model, amortizing the multi-second load across all requests."""
+        q = self._tts_queue
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + 0.02
+            while len(batch) < 8:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            if self.tts is None:
+                try:
+                    try:
+                        import torch
+                        use_gpu = torch.cuda.is_available()
+                    except ImportError:
+                        use_gpu = False
+                    tts_model = self.config.get("tts_model", "tts_models/en/ljspeech/vits")
+                    self.logger.info("Initializing TTS for Q&A responses...")
+                    self.tts = TTS(model_name=tts_model, progress_bar=False, gpu=use_gpu)
+                except Exception as exc:
+                    for _, _, fut in batch:
+                        fut.set_exception(exc)
+                    continue
+
+            for text, path, fut in batch:
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                try:
+                    self.tts.tts_to_file(text=text, file_path=path)
+                    fut.set_result(path)
+                except Exception as exc:
+                    fut.set_exception(exc)
+
+    def _submit_tts(self, text: str, path: str) -> concurrent.futures.Future:
+        """Queue a synthesis job on the persistent worker thread."""
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        self._tts_queue.put((text, path, fut))
+        return fut
+
     def generate_spoken_answer(self, answer_text: str, output_path: str = None) -> Optional[str]:
         """
         Convert answer text to speech using the existing TTS setup
@@ -195,15 +666,21 @@ Please provide a helpful answer:"""
             
         if output_path is None:
             output_path = os.path.join(self.config.get("temp_dir", "temp"), "qa_response.wav")
-        
+
         try:
-            if self.tts is None:
-                self.logger.info("Initializing TTS for Q&A responses...")
-                # Use VITS model for better quality (same as main lecture)
-                tts_model = self.config.get("tts_model", "tts_models/en/ljspeech/vits")
-                self.tts = TTS(model_name=tts_model, progress_bar=False)
-            
-            self.tts.tts_to_file(text=answer_text, file_path=output_path)
+            # Content-hash WAV cache: a repeated answer is copied out instead
+            # of re-synthesized (the player still fetches the fixed path).
+            cache_dir = Path(self.config.get("temp_dir", "temp")) / "qa_cache"
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            cached = cache_dir / f"{self.audio_token(answer_text)}.wav"
+            if cached.exists():
+                shutil.copyfile(cached, output_path)
+                return output_path
+
+            self._submit_tts(answer_text, output_path).result(timeout=120)
+            tmp = str(cached) + ".tmp"
+            shutil.copyfile(output_path, tmp)
+            os.replace(tmp, cached)
             self.logger.info(f"Generated audio response: {output_path}")
             return output_path
             
@@ -211,28 +688,37 @@ Please provide a helpful answer:"""
             self.logger.error(f"Failed to generate audio: {e}")
             return None
     
-    def ask_and_respond(self, question: str, current_slide: Optional[int] = None, 
+    def audio_token(self, answer_text: str) -> str:
+        """Content-hash token identifying one answer's WAV in the cache;
+        also what /api/ask hands the player so its audio URL is unique per
+        answer instead of replaying a stale browser-cached response."""
+        tts_model = self.config.get("tts_model", "tts_models/en/ljspeech/vits")
+        return hashlib.sha256(f"{tts_model}|{answer_text}".encode()).hexdigest()[:32]
+
+    def ask_and_respond(self, question: str, current_slide: Optional[int] = None,
                         generate_audio: bool = True) -> dict:
         """
         Complete Q&A flow: get answer and optionally generate audio
-        
+
         Args:
             question: The student's question
             current_slide: Current slide number
             generate_audio: Whether to generate TTS audio
-            
+
         Returns:
-            dict with 'answer' (str) and 'audio_path' (str or None)
+            dict with 'answer' (str), 'audio_path' (str or None) and
+            'audio_token' (str or None)
         """
         answer = self.answer_question(question, current_slide)
-        
+
         audio_path = None
         if generate_audio and not answer.startswith("Error:"):
             audio_path = self.generate_spoken_answer(answer)
-        
+
         return {
             "answer": answer,
-            "audio_path": audio_path
+            "audio_path": audio_path,
+            "audio_token": self.audio_token(answer) if audio_path else None
         }
 
 
@@ -243,7 +729,7 @@ Please provide a helpful answer:"""
 def create_qa_server(handler: LectureQAHandler, port: int = 5001):
     """Create a simple Flask server for the web player to call"""
     try:
-        from flask import Flask, request, jsonify, send_file
+        from flask import Flask, request, jsonify, send_file, Response, stream_with_context
         from flask_cors import CORS
     except ImportError:
         print("Flask not installed. Run: pip install flask flask-cors")
@@ -266,18 +752,49 @@ def create_qa_server(handler: LectureQAHandler, port: int = 5001):
         
         response = {
             "answer": result["answer"],
-            "has_audio": result["audio_path"] is not None
+            "has_audio": result["audio_path"] is not None,
+            "audio_token": result["audio_token"]
         }
-        
+
         return jsonify(response)
-    
+
+    @app.route('/api/ask_stream', methods=['POST'])
+    def ask_question_stream():
+        data = request.json
+        question = data.get('question', '')
+        current_slide = data.get('current_slide')
+        generate_audio = data.get('generate_audio', True)
+
+        if not question:
+            return jsonify({"error": "No question provided"}), 400
+
+        def gen():
+            for piece in handler.ask_and_respond_stream(question, current_slide, generate_audio):
+                yield f"data: {json.dumps({'text': piece})}\n\n"
+            yield f"data: {json.dumps({'done': True, 'has_audio': generate_audio and TTS_AVAILABLE})}\n\n"
+
+        return Response(stream_with_context(gen()), mimetype='text/event-stream')
+
     @app.route('/api/audio', methods=['GET'])
     def get_audio():
-        audio_path = os.path.join(handler.config.get("temp_dir", "temp"), "qa_response.wav")
+        temp_dir = handler.config.get("temp_dir", "temp")
+        # A token pins the request to one answer's cached WAV, so a fetch
+        # racing a newer answer can't be served the wrong audio; the fixed
+        # path remains as fallback for tokenless callers.
+        token = request.args.get('t', '')
+        if re.fullmatch(r'[0-9a-f]{32}', token):
+            cached = os.path.join(temp_dir, "qa_cache", f"{token}.wav")
+            if os.path.exists(cached):
+                return send_file(cached, mimetype='audio/wav')
+        audio_path = os.path.join(temp_dir, "qa_response.wav")
         if os.path.exists(audio_path):
             return send_file(audio_path, mimetype='audio/wav')
         return jsonify({"error": "No audio available"}), 404
     
+    @app.route('/api/warmup', methods=['POST'])
+    def warmup():
+        return jsonify({"warmed": handler.warmup()})
+
     @app.route('/api/status', methods=['GET'])
     def get_status():
         status_ok, status_msg = handler.check_ollama_status()
@@ -405,7 +922,8 @@ if __name__ == "__main__":
             app = create_qa_server(handler)
             if app:
                 print("Starting Q&A API server on http://localhost:5001")
-                app.run(host='0.0.0.0', port=5001, debug=False)
+                print("(dev server; for production use: gunicorn -c gunicorn.conf.py wsgi:app)")
+                app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
         elif sys.argv[1] == "--test":
             if test_ollama_connection():
                 test_with_lecture()
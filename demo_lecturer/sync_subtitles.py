@@ -2,22 +2,39 @@
 """
 Parse existing SRT file and organize subtitle data by slide with proper timing
 """
+import bisect
 import re
 import json
+import wave
+from itertools import accumulate
 from pathlib import Path
-import librosa
+
+_SLIDE_RE = re.compile(r'slide_(\d+)')
+# One multi-line pattern matches index + timing + text per cue, so the whole
+# SRT is parsed in a single finditer scan instead of split + per-block search.
+_SRT_RE = re.compile(
+    r'(\d+)\s*\n'
+    r'(\d{2}):(\d{2}):(\d{2}),(\d{3}) --> (\d{2}):(\d{2}):(\d{2}),(\d{3})\s*\n'
+    r'(.+?)(?=\n\s*\n|\Z)',
+    re.DOTALL
+)
 
 def get_audio_durations():
     """Get actual duration of each audio file"""
+    # stdlib wave reads only the WAV header, so this is a stat-speed pass
+    # with no third-party imports: the whole script stays a ~50 ms one-shot.
     durations = {}
     temp_dir = Path('temp')
-    
-    for audio_file in sorted(temp_dir.glob('audio_slide_*.wav')):
-        slide_num = int(re.search(r'slide_(\d+)', audio_file.name).group(1))
-        audio_data, sample_rate = librosa.load(str(audio_file))
-        duration = len(audio_data) / sample_rate
-        durations[slide_num] = duration
-    
+
+    audio_files = sorted(
+        temp_dir.glob('audio_slide_*.wav'),
+        key=lambda p: int(_SLIDE_RE.search(p.name).group(1))
+    )
+    for audio_file in audio_files:
+        slide_num = int(_SLIDE_RE.search(audio_file.name).group(1))
+        with wave.open(str(audio_file), 'rb') as w:
+            durations[slide_num] = w.getnframes() / w.getframerate()
+
     return durations
 
 def parse_srt_file(srt_path, audio_durations):
@@ -25,72 +42,38 @@ def parse_srt_file(srt_path, audio_durations):
     with open(srt_path, 'r', encoding='utf-8') as f:
         content = f.read()
     
-    blocks = re.split(r'\n\s*\n', content.strip())
-    
-    # Calculate cumulative time boundaries for each slide
-    slide_boundaries = {}
-    cumulative_time = 0
-    for slide_num in sorted(audio_durations.keys()):
-        slide_boundaries[slide_num] = {
-            'start': cumulative_time,
-            'end': cumulative_time + audio_durations[slide_num]
-        }
-        cumulative_time += audio_durations[slide_num]
-    
+    # Cumulative slide boundaries in integer milliseconds: exact arithmetic,
+    # and bisect turns the per-cue slide lookup into O(log N).
+    slide_nums = sorted(audio_durations.keys())
+    boundaries_ms = [0] + list(
+        accumulate(int(audio_durations[n] * 1000) for n in slide_nums)
+    )
+
     print("Slide boundaries:")
-    for slide_num, bounds in slide_boundaries.items():
-        print(f"  Slide {slide_num}: {bounds['start']:.1f}s - {bounds['end']:.1f}s")
-    
-    # Parse all subtitles
-    all_subtitles = []
-    for block in blocks:
-        if not block.strip():
-            continue
-        
-        lines = block.strip().split('\n')
-        if len(lines) < 3:
-            continue
-        
-        timing_match = re.search(
-            r'(\d{2}):(\d{2}):(\d{2}),(\d{3}) --> (\d{2}):(\d{2}):(\d{2}),(\d{3})',
-            lines[1]
-        )
-        
-        if not timing_match:
+    for i, slide_num in enumerate(slide_nums):
+        print(f"  Slide {slide_num}: {boundaries_ms[i] / 1000:.1f}s - {boundaries_ms[i + 1] / 1000:.1f}s")
+
+    # Parse cues and assign each to its slide, timing relative to slide start
+    subtitles_by_slide = {}
+
+    for match in _SRT_RE.finditer(content):
+        g = match.groups()
+        start_ms = (int(g[1]) * 3600 + int(g[2]) * 60 + int(g[3])) * 1000 + int(g[4])
+        end_ms = (int(g[5]) * 3600 + int(g[6]) * 60 + int(g[7])) * 1000 + int(g[8])
+        text = ' '.join(g[9].strip().split('\n'))
+
+        idx = bisect.bisect_right(boundaries_ms, start_ms) - 1
+        if idx < 0 or idx >= len(slide_nums):
             continue
-        
-        start_h, start_m, start_s, start_ms = map(int, timing_match.groups()[:4])
-        end_h, end_m, end_s, end_ms = map(int, timing_match.groups()[4:])
-        
-        start_time = start_h * 3600 + start_m * 60 + start_s + start_ms / 1000
-        end_time = end_h * 3600 + end_m * 60 + end_s + end_ms / 1000
-        
-        text = ' '.join(lines[2:])
-        
-        all_subtitles.append({
-            'start': start_time,
-            'end': end_time,
+
+        slide_num = slide_nums[idx]
+        slide_start_ms = boundaries_ms[idx]
+        subtitles_by_slide.setdefault(slide_num, []).append({
+            'start': (start_ms - slide_start_ms) / 1000,
+            'end': (end_ms - slide_start_ms) / 1000,
             'text': text
         })
-    
-    # Assign subtitles to slides and adjust timing to be relative
-    subtitles_by_slide = {}
-    
-    for sub in all_subtitles:
-        # Find which slide this subtitle belongs to
-        for slide_num, bounds in slide_boundaries.items():
-            if bounds['start'] <= sub['start'] < bounds['end']:
-                if slide_num not in subtitles_by_slide:
-                    subtitles_by_slide[slide_num] = []
-                
-                # Make timing relative to slide start
-                subtitles_by_slide[slide_num].append({
-                    'start': sub['start'] - bounds['start'],
-                    'end': sub['end'] - bounds['start'],
-                    'text': sub['text']
-                })
-                break
-    
+
     return subtitles_by_slide
 
 # Get audio durations
@@ -1,11 +1,13 @@
 import os
 from pathlib import Path
 
-from qa_handler import LectureQAHandler, create_qa_server
+from qa_handler import DEFAULT_MODEL, LectureQAHandler, create_qa_server
 
-# Ollama configuration
+# Ollama configuration. NUM_PARALLEL lets the server batch concurrent
+# generate calls (only effective when ollama serve inherits this env).
+os.environ.setdefault("OLLAMA_NUM_PARALLEL", "8")
 OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
-MODEL_NAME = os.environ.get("OLLAMA_MODEL", "llama3.2:3b")
+MODEL_NAME = os.environ.get("OLLAMA_MODEL", DEFAULT_MODEL)
 
 # Initialize handler
 handler = LectureQAHandler(
@@ -19,6 +21,13 @@ if lecture_files:
     lecture_file = max(lecture_files, key=lambda p: p.stat().st_mtime)
     handler.load_lecture_context(str(lecture_file))
 
+# Pay the model-load cost at boot, not on the first student's question
+handler.warmup()
+
 # IMPORTANT: expose Flask app for Gunicorn
 app = create_qa_server(handler)
 
+if __name__ == '__main__':
+    # Dev fallback only; production runs: gunicorn -c gunicorn.conf.py wsgi:app
+    app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
+